@@ -1 +1 @@
-from .api import QFrame, union, join
+from .api import QFrame, union, join, federated_join, to_sql_batch, clear_preview_cache
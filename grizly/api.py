@@ -1 +1,4 @@
 from .core.qframe import QFrame, union, join
+from .io.federated import federated_join
+from .io.batch import to_sql_batch
+from .io.sqlbuilder import clear_preview_cache
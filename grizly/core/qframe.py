@@ -1,8 +1,13 @@
 from IPython.display import HTML, display
 import pandas
 import re
-from grizly.io.sqlbuilder import get_sql, to_sql, build_column_strings
+import warnings
+from grizly.io.sqlbuilder import get_sql, to_sql, build_column_strings, explain, preview
 from grizly.io.excel import read_excel
+from grizly.io import stream
+from grizly.io.spill import to_sql_chunked
+from grizly.io.reflect import table_stats
+from grizly.io.execution import run_async
 import sqlparse
 
 
@@ -55,7 +60,7 @@ class QFrame:
         self.getfields = getfields  # remove this and put in data
         self.fieldattrs = ["type","as","group_by","expression","select"]
         self.fieldtypes = ["dim","num"]
-        self.metaattrs = ["limit", "where"]
+        self.metaattrs = ["limit", "where", "having", "orderby", "distinct", "topn"]
 
     def validate_data(self, data):
         # validating fields, need to validate other stuff too
@@ -85,6 +90,25 @@ class QFrame:
         data["table"] = table
         return QFrame(data=data)
 
+    def from_table(self, engine_string, schema, table, ttl=86400, cache_path=None):
+        """
+        Creates QFrame from a database table. Columns and their types are reflected from the
+        database and cached together with row counts and distinct counts for ttl seconds,
+        see grizly.io.reflect.table_stats. Numeric columns are num, other columns and
+        integer keys are dim.
+
+                >>> q = QFrame().from_table(engine_string, schema="", table="tracks")
+                >>> q.get_sql()
+                >>> q.to_sql()
+        """
+        stats = table_stats(engine_string, schema, table, ttl=ttl, path=cache_path)
+        data = {}
+        data["fields"] = {column: {"type": stats["columns"][column]["type"]} for column in stats["columns"]}
+        data["schema"] = schema
+        data["table"] = table
+        data["engine_string"] = engine_string
+        return QFrame(data=data)
+
     def create_sql_blocks(self):
           return build_column_strings(self)
 
@@ -162,6 +186,64 @@ class QFrame:
         self.data["limit"] = str(limit)
         return self
 
+    def having(self, having):
+        """
+        Creates a "having" attribute inside the data dictionary. The condition is
+        added to the HAVING clause as it is.
+
+        >>> q.groupby(["Customer"])["Value"].agg("sum")
+        >>> q.having("sum(Orders.Value) > 1000")
+        """
+        self.data["having"] = having
+        return self
+
+    def orderby(self, fields, ascending=True):
+        """
+        Adds ORDER BY statement. Fields are replaced by their aliases (eg. sum_Value
+        for aggregated fields).
+
+        Parameters:
+        ----------
+        fields : string or list of strings
+        ascending : Boolean or list of Booleans, default True
+
+        Examples:
+        --------
+            >>> q.orderby("Value")
+            >>> q.orderby(["Customer", "Value"], [True, False])
+        """
+        if isinstance(fields, str):
+            fields = [fields]
+        if isinstance(ascending, list) and len(ascending) != len(fields):
+            raise ValueError("Fields and ascending have different lengths.")
+        self.data["orderby"] = {"fields": fields, "ascending": ascending}
+        return self
+
+    def distinct(self):
+        """
+        Adds DISTINCT statement.
+        """
+        self.data["distinct"] = True
+        return self
+
+    def topn(self, n, by, per=[], ascending=False):
+        """
+        Keeps only the first n rows by the by fields (largest first by default), in each
+        group of per fields if specified. Rows are ranked with ROW_NUMBER() in a
+        subquery so the database returns only the final rows.
+
+        Examples:
+        --------
+            >>> q.groupby(["Country", "Customer"])["Value"].agg("sum")
+            >>> q.topn(3, by="Value", per="Country")
+        """
+        if isinstance(by, str):
+            by = [by]
+        if isinstance(per, str):
+            per = [per]
+        self.data["topn"] = {"n": n, "by": by, "per": per, "ascending": ascending}
+        return self
+
     def select(self):
         """
         Creates a subquery that looks like select col1, col2 from (some sql)
@@ -190,14 +272,175 @@ class QFrame:
         html_table += "</table>"
         display(HTML(html_table))
 
-    def to_sql(self, engine_string=""):  # put engine_string in fields as meta
+    def to_sql(
+        self,
+        engine_string="",
+        guard="",
+        max_cost=None,
+        memory_limit=None,
+        chunksize=10000,
+        spill_dir=None,
+        timeout=None,
+        retries=0,
+        backoff=1,
+        format="pandas",
+    ):  # put engine_string in fields as meta
+        """
+        Runs the sql statement and returns a pandas DataFrame.
+
+        Parameters:
+        ----------
+        guard : string, default ""
+            If "warn" or "raise" the query plan is checked with explain() before
+            running the query and a warning is issued or ValueError is raised when
+            the plan's cost is over max_cost (or, if max_cost is None, when the plan
+            has any warnings).
+        max_cost : number, default None
+            Cost threshold for guard, see explain().
+        memory_limit : int, default None
+            Memory budget in bytes. If specified the result is fetched in batches of chunksize
+            rows and a ChunkedResult is returned instead of a DataFrame. Batches over the
+            budget are spilled to memory-mapped files in spill_dir (default system temp).
+            Values are returned as fetched, floats are not formatted.
+        timeout : number, default None
+            Statement timeout in seconds, TimeoutError is raised when it's exceeded.
+        retries : int, default 0
+            Number of retries on transient connection errors, waiting backoff * 2 ** attempt
+            seconds between attempts. Timeouts are not retried.
+        format : {"pandas", "arrow", "numpy"}, default "pandas"
+            With "arrow" returns a pyarrow Table, with "numpy" a dictionary {column: NumPy array}.
+            Both are built directly from cursor batches of chunksize rows, without a DataFrame.
+
+        memory_limit and format "arrow" / "numpy" fetch the result in batches and can't be
+        combined with each other, with timeout or with retries - ValueError is raised.
+        spill_dir requires memory_limit. chunksize is not used when the DataFrame is read at once.
+        """
+        if format not in ["pandas", "arrow", "numpy"]:
+            raise ValueError("Format must be pandas, arrow or numpy.")
+        if format != "pandas" and memory_limit is not None:
+            raise ValueError("memory_limit can't be used with format {}.".format(format))
+        if (format != "pandas" or memory_limit is not None) and (timeout is not None or retries != 0):
+            raise ValueError("timeout and retries can't be used with memory_limit or format {}.".format(format))
+        if spill_dir is not None and memory_limit is None:
+            raise ValueError("spill_dir requires memory_limit.")
         sql = self.sql
-        if engine_string != "":
-            df = to_sql(sql, engine_string)
-        else:
-            df = to_sql(sql, self.data["engine_string"])
+        if engine_string == "":
+            engine_string = self.data["engine_string"]
+        if guard != "":
+            if guard not in ["warn", "raise"]:
+                raise ValueError("Guard must be warn or raise.")
+            plan = explain(sql, engine_string)
+            if max_cost is not None:
+                refuse = plan["cost"] is not None and plan["cost"] > max_cost
+                msg = "Query plan cost {} is over {}.".format(plan["cost"], max_cost)
+            else:
+                refuse = plan["warnings"] != []
+                msg = "Query plan has warnings: {}".format("; ".join(plan["warnings"]))
+            if refuse and guard == "raise":
+                raise ValueError(msg)
+            elif refuse:
+                warnings.warn(msg)
+        if format == "arrow":
+            return stream.to_arrow(sql, engine_string, chunksize=chunksize)
+        elif format == "numpy":
+            return stream.to_numpy(sql, engine_string, chunksize=chunksize)
+        if memory_limit is not None:
+            return to_sql_chunked(sql, engine_string, memory_limit, chunksize=chunksize, spill_dir=spill_dir)
+        df = to_sql(sql, engine_string, timeout=timeout, retries=retries, backoff=backoff)
         return df
 
+    def to_sql_async(self, engine_string="", timeout=None, retries=0, backoff=1):
+        """
+        Runs the sql statement in a background thread and returns a QueryHandle which can
+        be used to wait for the DataFrame or cancel the query from another thread.
+        See to_sql for timeout, retries and backoff.
+
+                >>> handle = q.to_sql_async(engine_string, timeout=600)
+                >>> handle.cancel()
+                >>> df = handle.result()
+        """
+        if engine_string == "":
+            engine_string = self.data["engine_string"]
+        return run_async(to_sql, self.sql, engine_string, timeout=timeout, retries=retries, backoff=backoff)
+
+    def to_csv(self, path, engine_string="", chunksize=10000, partition_by="", sep=","):
+        """
+        Streams the result of the sql statement into a csv file without building a DataFrame.
+        To get sql use get_sql() first.
+
+                >>> q.get_sql()
+                >>> q.to_csv("tracks.csv", engine_string)
+                >>> q.to_csv("tracks", engine_string, partition_by="GenreId")
+
+        See grizly.io.stream.to_csv for parameters.
+        """
+        if engine_string == "":
+            engine_string = self.data["engine_string"]
+        stream.to_csv(self.sql, engine_string, path, chunksize=chunksize, partition_by=partition_by, sep=sep)
+        return self
+
+    def to_parquet(self, path, engine_string="", chunksize=10000, compression="snappy", partition_by=""):
+        """
+        Streams the result of the sql statement into a parquet file without building a DataFrame.
+        To get sql use get_sql() first. Requires pyarrow.
+
+                >>> q.get_sql()
+                >>> q.to_parquet("tracks.parquet", engine_string, compression="zstd")
+
+        See grizly.io.stream.to_parquet for parameters.
+        """
+        if engine_string == "":
+            engine_string = self.data["engine_string"]
+        stream.to_parquet(
+            self.sql, engine_string, path, chunksize=chunksize, compression=compression, partition_by=partition_by
+        )
+        return self
+
+    def explain(self, engine_string="", large_table=100000):
+        """
+        Returns the database's query plan for the sql statement. To get sql use get_sql() first.
+
+                >>> q.get_sql()
+                >>> plan = q.explain(engine_string)
+                >>> plan["warnings"]
+                ['Full table scan on tracks (3503 rows)', 'Temp B-tree sort: USE TEMP B-TREE FOR ORDER BY']
+
+        See grizly.io.sqlbuilder.explain for the structure of the result.
+        """
+        if engine_string == "":
+            engine_string = self.data["engine_string"]
+        return explain(self.sql, engine_string, large_table=large_table)
+
+    def head(self, n=5, engine_string="", cache=True):
+        """
+        Returns the first n rows of the query. The LIMIT is added in a wrapping
+        subquery so data["limit"] is not changed. Results of recent previews are cached,
+        set cache=False to rerun the query (or see grizly.clear_preview_cache).
+
+                >>> q.get_sql()
+                >>> q.head(10, engine_string)
+        """
+        if engine_string == "":
+            engine_string = self.data["engine_string"]
+        return preview(self, engine_string, n=n, cache=cache)
+
+    def sample(self, n=None, frac=None, engine_string="", cache=True):
+        """
+        Returns a random sample of n rows or a frac fraction of rows of the query.
+        If neither is given returns one row. Results are cached, set cache=False
+        to draw a new sample.
+
+                >>> q.get_sql()
+                >>> q.sample(frac=0.1, engine_string=engine_string)
+        """
+        if n is not None and frac is not None:
+            raise ValueError("Please specify n or frac, not both.")
+        if n is None and frac is None:
+            n = 1
+        if engine_string == "":
+            engine_string = self.data["engine_string"]
+        return preview(self, engine_string, n=n, frac=frac, sample=True, cache=cache)
+
     def get_sql(self, subquery=False):
         """
         Overwrites the sql statement inside the class. Returns a class. To get sql use your_class_name.sql
@@ -0,0 +1,127 @@
+import re
+from copy import deepcopy
+import pandas
+from sqlalchemy import create_engine
+from grizly.io.sqlbuilder import get_sql, format_floats
+
+
+def base_key(qf):
+    """
+    QFrames with the same key read the same rows: same table, filters and sample.
+    """
+    data = qf.data
+    return (data.get("schema", ""), data["table"], data.get("where", ""), data.get("tablesample", ""))
+
+
+def shareable(qf):
+    """
+    QFrames can run against a shared base if all columns in their expressions and having
+    are prefixed with the table name, other identifiers (eg. from assign(notable=True))
+    may refer to columns which are not in the base.
+    """
+    data = qf.data
+    words = ["AND", "OR", "NOT", "NULL", "IS", "IN", "LIKE", "BETWEEN", "CASE", "WHEN", "THEN", "ELSE", "END", "AS"]
+    texts = [data.get("having", "")]
+    for field in data["fields"]:
+        if "expression" in data["fields"][field]:
+            texts.append(data["fields"][field]["expression"])
+    for text in texts:
+        text = re.sub(r"'[^']*'", "", text)
+        text = re.sub(r"\b{}\.\w+".format(re.escape(data["table"])), "", text)
+        # identifiers which are not function names
+        for word in re.findall(r"\b[A-Za-z_]\w*\b(?!\s*\()", text):
+            if word.upper() not in words:
+                return False
+    return True
+
+
+def edited(qf):
+    """
+    Returns True if qf.sql was changed after get_sql(), such QFrames are run with their own sql.
+    """
+    return qf.sql != "" and qf.sql != get_sql(deepcopy(qf)).sql
+
+
+def base_columns(qframes):
+    """
+    Returns columns of the base table used by the QFrames - field names and columns
+    referenced as table.column in expressions and having.
+    """
+    columns = []
+    for qf in qframes:
+        data = qf.data
+        texts = [data.get("having", "")]
+        for field in data["fields"]:
+            if "expression" in data["fields"][field]:
+                texts.append(data["fields"][field]["expression"])
+            elif field not in columns:
+                columns.append(field)
+        for text in texts:
+            for column in re.findall(r"\b{}\.(\w+)".format(re.escape(data["table"])), text):
+                if column not in columns:
+                    columns.append(column)
+    return columns
+
+
+def to_sql_batch(qframes, engine_string=""):
+    """
+    Runs a batch of QFrames and returns a list of DataFrames. QFrames which share the
+    same base (table, where and tablesample) are detected, each shared base is
+    materialized once into a temporary table and all QFrames sharing it are run
+    against the temporary table. Temporary tables are dropped at the end.
+    QFrames with columns in expressions or having which are not prefixed with the
+    table name (as assign() does) or with qf.sql edited after get_sql() are run on
+    their own. Results are formatted like QFrame.to_sql results.
+
+        >>> q1.groupby(["Country"])["Value"].agg("sum")
+        >>> q2.groupby(["Customer"])["Value"].agg("sum")
+        >>> df1, df2 = to_sql_batch([q1, q2], engine_string)
+    """
+    if engine_string == "":
+        engine_string = qframes[0].data["engine_string"]
+    engine = create_engine(engine_string)
+    mssql = engine.dialect.name == "mssql"
+
+    bases = {}
+    for qf in qframes:
+        key = base_key(qf) if shareable(qf) and not edited(qf) else id(qf)
+        bases.setdefault(key, []).append(qf)
+
+    sqls = {}
+    temp_tables = []
+    with engine.connect() as con:
+        try:
+            for key in bases:
+                if len(bases[key]) == 1:
+                    qf = bases[key][0]
+                    sqls[id(qf)] = qf.sql if qf.sql != "" else get_sql(deepcopy(qf)).sql
+                    continue
+                schema, table, where, tablesample = key
+                temp_table = "{}grizly_base_{}".format("#" if mssql else "", len(temp_tables))
+                columns = ", ".join(base_columns(bases[key]))
+                source = "{}.{}".format(schema, table) if schema != "" else table
+                if tablesample != "":
+                    source += " TABLESAMPLE {}".format(tablesample)
+                if where != "":
+                    source += " WHERE {}".format(where)
+                if mssql:
+                    sql = "SELECT {} INTO {} FROM {}".format(columns, temp_table, source)
+                else:
+                    sql = "CREATE TEMPORARY TABLE {} AS SELECT {} FROM {}".format(temp_table, columns, source)
+                con.exec_driver_sql(sql)
+                temp_tables.append(temp_table)
+                for qf in bases[key]:
+                    _qf = deepcopy(qf)
+                    _qf.data["source"] = temp_table
+                    _qf.data.pop("where", None)
+                    _qf.data.pop("tablesample", None)
+                    sqls[id(qf)] = get_sql(_qf).sql
+            dfs = [format_floats(pandas.read_sql(sql=sqls[id(qf)], con=con)) for qf in qframes]
+        except Exception:
+            con.rollback()
+            raise
+        finally:
+            for temp_table in temp_tables:
+                con.exec_driver_sql("DROP TABLE IF EXISTS {}".format(temp_table))
+            con.commit()
+    return dfs
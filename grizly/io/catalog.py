@@ -0,0 +1,175 @@
+"""
+Compiles a directory of QFrame specs into SQL files.
+
+Specs are Excel files (every sheet is a spec, see QFrame.read_excel) and json files
+with a dictionary spec (see QFrame.from_dict). A manifest with content hashes of the
+spec files is kept in the output directory so only changed files are compiled again.
+
+    python -m grizly.io.catalog specs_dir output_dir --workers 8
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import pandas
+from grizly.core.qframe import QFrame
+
+extensions = [".xlsx", ".xls", ".json"]
+manifest_name = "manifest.json"
+
+
+def file_hash(path):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def find_specs(spec_dir):
+    """
+    Returns relative paths of spec files in spec_dir and its subdirectories.
+    """
+    paths = []
+    for root, dirs, files in os.walk(spec_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if os.path.splitext(name)[1].lower() in extensions and not name.startswith("~$"):
+                paths.append(os.path.relpath(os.path.join(root, name), spec_dir))
+    return paths
+
+
+def compiled(entry, sha):
+    """
+    Returns True if the manifest entry of a file has the same hash and no errors,
+    files with errors are compiled again on every run so the errors are reported.
+    """
+    if entry is None or entry["hash"] != sha:
+        return False
+    return all(spec["error"] is None for spec in entry["specs"].values())
+
+
+def compile_file(spec_dir, path, output_dir):
+    """
+    Compiles all specs of one file and writes their SQL. Returns a dictionary
+    {spec_id: {"sql_path", "seconds", "error"}}, spec_id is the relative path of the
+    file, followed by #sheet_name for Excel sheets.
+    """
+    stem, extension = os.path.splitext(path)
+    full_path = os.path.join(spec_dir, path)
+    specs = {}
+    if extension.lower() == ".json":
+
+        def read_spec():
+            with open(full_path) as f:
+                return QFrame().from_dict(json.load(f))
+
+        specs[path] = (stem + ".sql", read_spec)
+    else:
+        try:
+            excel_file = pandas.ExcelFile(full_path)
+        except Exception as e:
+            return {path: {"sql_path": None, "seconds": 0, "error": "{}: {}".format(type(e).__name__, e)}}
+        for sheet_name in excel_file.sheet_names:
+            specs["{}#{}".format(path, sheet_name)] = (
+                "{}__{}.sql".format(stem, sheet_name),
+                lambda sheet_name=sheet_name: QFrame().read_excel(excel_file, sheet_name=sheet_name),
+            )
+
+    results = {}
+    for spec_id in specs:
+        sql_path, read_spec = specs[spec_id]
+        start = time.perf_counter()
+        try:
+            sql = read_spec().get_sql().sql
+            out_path = os.path.join(output_dir, sql_path)
+            os.makedirs(os.path.dirname(out_path), exist_ok=True)
+            with open(out_path, "w") as f:
+                f.write(sql)
+            error = None
+        except Exception as e:
+            sql_path = None
+            error = "{}: {}".format(type(e).__name__, e)
+        results[spec_id] = {"sql_path": sql_path, "seconds": time.perf_counter() - start, "error": error}
+    return results
+
+
+def compile_catalog(spec_dir, output_dir, workers=None, force=False):
+    """
+    Compiles every spec in spec_dir into output_dir, one SQL file per spec, using a
+    pool of workers processes (default number of CPUs). Files whose content hash is
+    in the manifest are skipped unless force is True or they had errors, SQL of
+    removed files is deleted.
+    Per spec timing and errors are saved in output_dir/manifest.json.
+
+        >>> summary = compile_catalog("specs", "sql", workers=8)
+        >>> summary["compiled"], summary["skipped"], summary["errors"]
+
+    Returns a dictionary with numbers of compiled, skipped and removed files, errors
+    {spec_id: error} and total seconds.
+    """
+    start = time.perf_counter()
+    manifest_path = os.path.join(output_dir, manifest_name)
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+
+    paths = find_specs(spec_dir)
+    hashes = {path: file_hash(os.path.join(spec_dir, path)) for path in paths}
+    changed = [path for path in paths if force or not compiled(manifest.get(path), hashes[path])]
+
+    removed = [path for path in manifest if path not in hashes]
+    for path in removed + changed:
+        for spec in manifest.get(path, {}).get("specs", {}).values():
+            if spec["sql_path"] is not None and os.path.exists(os.path.join(output_dir, spec["sql_path"])):
+                os.remove(os.path.join(output_dir, spec["sql_path"]))
+        manifest.pop(path, None)
+
+    os.makedirs(output_dir, exist_ok=True)
+    if changed != []:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {path: executor.submit(compile_file, spec_dir, path, output_dir) for path in changed}
+            for path in changed:
+                manifest[path] = {"hash": hashes[path], "specs": futures[path].result()}
+
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+
+    errors = {}
+    for path in changed:
+        for spec_id, spec in manifest[path]["specs"].items():
+            if spec["error"] is not None:
+                errors[spec_id] = spec["error"]
+    return {
+        "compiled": len(changed),
+        "skipped": len(paths) - len(changed),
+        "removed": len(removed),
+        "errors": errors,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Compile a directory of QFrame specs into SQL files.")
+    parser.add_argument("spec_dir")
+    parser.add_argument("output_dir")
+    parser.add_argument("--workers", type=int, default=None, help="number of processes, default number of CPUs")
+    parser.add_argument("--force", action="store_true", help="compile all specs, ignoring the manifest")
+    args = parser.parse_args(args)
+    summary = compile_catalog(args.spec_dir, args.output_dir, workers=args.workers, force=args.force)
+    print(
+        "Compiled {} files, skipped {} unchanged, removed {} in {:.2f}s".format(
+            summary["compiled"], summary["skipped"], summary["removed"], summary["seconds"]
+        )
+    )
+    for spec_id in summary["errors"]:
+        print("{}: {}".format(spec_id, summary["errors"][spec_id]))
+    return 1 if summary["errors"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,168 @@
+import threading
+import time
+from concurrent.futures import Future, CancelledError
+import pandas
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError, InterfaceError, DBAPIError
+
+
+class QueryHandle:
+    """
+    Handle of a query running in the background, see to_sql_async.
+
+            >>> handle = q.to_sql_async(engine_string, timeout=600)
+            >>> handle.cancel()
+            >>> df = handle.result()  # raises CancelledError
+    """
+
+    def __init__(self):
+        self.cancelled = threading.Event()
+        self.connection = None  # DBAPI connection of the running query
+        self.future = Future()
+
+    def cancel(self):
+        """
+        Cancels the query. Running SQLite queries are interrupted, on other databases the
+        driver's cancel() is used if available (eg. psycopg2). Pending retries are stopped.
+        """
+        self.cancelled.set()
+        connection = self.connection
+        if connection is not None:
+            if hasattr(connection, "interrupt"):
+                connection.interrupt()
+            elif hasattr(connection, "cancel"):
+                connection.cancel()
+
+    def done(self):
+        return self.future.done()
+
+    def result(self, timeout=None):
+        """
+        Waits for the query and returns the DataFrame or raises the query's exception.
+        """
+        return self.future.result(timeout)
+
+
+def _read_sql(engine, sql, timeout, handle):
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    dialect = engine.dialect.name
+    with engine.connect() as con:
+        connection = con.connection.dbapi_connection
+        progress_handler = dialect == "sqlite" and (timeout is not None or handle is not None)
+        if progress_handler:
+
+            def progress():
+                if handle is not None and handle.cancelled.is_set():
+                    return 1
+                if deadline is not None and time.monotonic() > deadline:
+                    return 1
+                return 0
+
+            connection.set_progress_handler(progress, 1000)
+        elif timeout is not None and dialect == "postgresql":
+            # applies only to the current transaction, which is rolled back when the
+            # connection is returned, so no reset is needed after a timeout
+            con.exec_driver_sql("SET LOCAL statement_timeout = {}".format(int(timeout * 1000)))
+        elif timeout is not None and dialect == "mysql":
+            con.exec_driver_sql("SET SESSION max_execution_time = {}".format(int(timeout * 1000)))
+        if handle is not None:
+            handle.connection = connection
+        try:
+            return pandas.read_sql(sql=sql, con=con)
+        except (DBAPIError, pandas.errors.DatabaseError):
+            if handle is not None and handle.cancelled.is_set():
+                raise CancelledError("Query was cancelled.")
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError("Query exceeded timeout of {} seconds.".format(timeout))
+            raise
+        finally:
+            if handle is not None:
+                handle.connection = None
+            if progress_handler:
+                connection.set_progress_handler(None, 1000)
+            elif timeout is not None and dialect == "mysql":
+                con.exec_driver_sql("SET SESSION max_execution_time = 0")
+
+
+transient_messages = [
+    "database is locked",
+    "database table is locked",
+    "could not connect",
+    "connection refused",
+    "server closed the connection",
+    "connection reset",
+    "terminating connection",
+]
+mysql_transient_codes = [1205, 1213, 2003, 2006, 2013]  # lock wait, deadlock, lost connection
+
+
+def transient(error):
+    """
+    Returns True for errors worth retrying: lost or refused connections, locks and
+    deadlocks. Other OperationalErrors (eg. no such table, syntax errors) are not transient.
+    """
+    if isinstance(error, InterfaceError) or error.connection_invalidated:
+        return True
+    if not isinstance(error, OperationalError):
+        return False
+    orig = error.orig
+    pgcode = getattr(orig, "pgcode", None)
+    if pgcode is not None:
+        # connection exceptions, serialization failures and deadlocks, insufficient
+        # resources, operator intervention except query_canceled
+        return pgcode[:2] in ["08", "40", "53", "57"] and pgcode != "57014"
+    args = getattr(orig, "args", ())
+    if len(args) > 0 and args[0] in mysql_transient_codes:
+        return True
+    message = str(orig).lower()
+    return any(text in message for text in transient_messages)
+
+
+def read_sql(sql, engine_string, timeout=None, retries=0, backoff=1, handle=None):
+    """
+    Runs the sql statement and returns a pandas DataFrame.
+
+    timeout: statement timeout in seconds, TimeoutError is raised when it's exceeded.
+        SQLite queries are stopped with a progress handler, on PostgreSQL the transaction's
+        statement_timeout (SET LOCAL) and on MySQL the session's max_execution_time is set.
+    retries: number of retries on transient errors (lost connections, locked databases,
+        deadlocks, see transient), with backoff * 2 ** attempt seconds between attempts.
+        Other errors, timeouts and cancellations are not retried.
+    handle: QueryHandle used to cancel the query from another thread.
+    """
+    engine = create_engine(engine_string)
+    attempt = 0
+    while True:
+        if handle is not None and handle.cancelled.is_set():
+            raise CancelledError("Query was cancelled.")
+        try:
+            return _read_sql(engine, sql, timeout, handle)
+        except (DBAPIError, pandas.errors.DatabaseError) as e:
+            if isinstance(e, pandas.errors.DatabaseError):
+                e = e.__cause__  # pandas wraps SQLAlchemy errors
+            if not isinstance(e, DBAPIError) or not transient(e) or attempt >= retries:
+                raise
+            delay = backoff * 2 ** attempt
+            attempt += 1
+            if handle is not None:
+                if handle.cancelled.wait(delay):
+                    raise CancelledError("Query was cancelled.")
+            else:
+                time.sleep(delay)
+
+
+def run_async(function, *args, **kwargs):
+    """
+    Runs function(*args, handle=handle, **kwargs) in a background thread and returns
+    the QueryHandle. The function's result or exception is set on handle.future.
+    """
+    handle = QueryHandle()
+
+    def target():
+        try:
+            handle.future.set_result(function(*args, handle=handle, **kwargs))
+        except BaseException as e:
+            handle.future.set_exception(e)
+
+    threading.Thread(target=target, daemon=True).start()
+    return handle
@@ -0,0 +1,127 @@
+import pandas
+from sqlalchemy import create_engine, text, MetaData, Table, Column, Integer, Float, String
+
+
+def count_rows(sql, engine_string, limit):
+    """
+    Counts rows of the sql statement up to limit, so the count stops early on big results.
+    """
+    sql = "SELECT COUNT(*) AS n FROM (SELECT 1 AS one FROM ({}) sq LIMIT {}) sq".format(sql, limit)
+    return int(pandas.read_sql(sql=sql, con=create_engine(engine_string))["n"][0])
+
+
+def fetch_in_list(sql, engine_string, columns, keys, max_in_list):
+    """
+    Runs the sql statement filtered to keys, one query per max_in_list keys. Keys are
+    passed as bind parameters.
+    """
+    engine = create_engine(engine_string)
+    dfs = []
+    for start in range(0, len(keys), max_in_list):
+        params = {}
+        conditions = []
+        for i, key in enumerate(keys[start : start + max_in_list]):
+            condition = []
+            for j, column in enumerate(columns):
+                params["k{}_{}".format(i, j)] = key[column]
+                condition.append("sq.{} = :k{}_{}".format(column, i, j))
+            conditions.append("({})".format(" AND ".join(condition)))
+        if len(columns) == 1:
+            values = ", ".join(":k{}_0".format(i) for i in range(len(conditions)))
+            where = "sq.{} IN ({})".format(columns[0], values)
+        else:
+            where = " OR ".join(conditions)
+        _sql = "SELECT * FROM ({}) sq WHERE {}".format(sql, where)
+        with engine.connect() as con:
+            dfs.append(pandas.read_sql(sql=text(_sql), con=con, params=params))
+    return pandas.concat(dfs, ignore_index=True)
+
+
+def fetch_temp_table(sql, engine_string, columns, keys, keys_df):
+    """
+    Loads keys into a temporary table and runs the sql statement joined with it.
+    """
+    types = {"i": Integer, "u": Integer, "f": Float}
+    table = Table(
+        "grizly_keys",
+        MetaData(),
+        *[Column(column, types.get(keys_df[column].dtype.kind, String)) for column in columns],
+        prefixes=["TEMPORARY"],
+    )
+    on = " AND ".join("sq.{0} = k.{0}".format(column) for column in columns)
+    _sql = "SELECT sq.* FROM ({}) sq JOIN grizly_keys k ON {}".format(sql, on)
+    engine = create_engine(engine_string)
+    with engine.connect() as con:
+        table.create(con)
+        con.execute(table.insert(), keys)
+        df = pandas.read_sql(sql=text(_sql), con=con)
+        table.drop(con)
+    return df
+
+
+def federated_join(l_q, r_q, on, l_engine="", r_engine="", how="inner", small="auto", max_in_list=1000):
+    """
+    Joins two QFrames which live in different databases. The smaller side is run first,
+    its distinct join keys are pushed into the other side's query - as a bind parameter
+    IN list or, if there are more than max_in_list keys, as a temporary table - so only
+    matching rows are fetched. The two results are joined locally with pandas.merge.
+    To get sql use get_sql() on both QFrames first.
+
+    Parameters:
+    ----------
+    on : list of tuples
+        Column pairs to join on, eg. [("GenreId", "GenreId")]. Use column aliases.
+    how : {"inner", "left", "right"}, default "inner"
+        With "left" the left side is always run first, with "right" the right side.
+    small : {"auto", "left", "right"}, default "auto"
+        Side to run first for inner joins. With "auto" rows of both sides are counted
+        up to max_in_list + 1 and the side with fewer rows is run first.
+
+    Examples:
+    --------
+        >>> genres_qf.get_sql()
+        >>> tracks_qf.get_sql()
+        >>> df = federated_join(genres_qf, tracks_qf, on=[("GenreId", "GenreId")],
+                                l_engine=engine_string_1, r_engine=engine_string_2)
+
+    Returns a pandas DataFrame.
+    """
+    if how not in ["inner", "left", "right"]:
+        raise ValueError("Join type must be inner, left or right.")
+    if l_engine == "":
+        l_engine = l_q.data["engine_string"]
+    if r_engine == "":
+        r_engine = r_q.data["engine_string"]
+    l_on = [tup[0] for tup in on]
+    r_on = [tup[1] for tup in on]
+
+    if how == "left":
+        small = "left"
+    elif how == "right":
+        small = "right"
+    elif small == "auto":
+        l_rows = count_rows(l_q.sql, l_engine, max_in_list + 1)
+        r_rows = count_rows(r_q.sql, r_engine, max_in_list + 1)
+        small = "left" if l_rows <= r_rows else "right"
+
+    if small == "left":
+        first, second, first_on, second_on = (l_q.sql, l_engine), (r_q.sql, r_engine), l_on, r_on
+    else:
+        first, second, first_on, second_on = (r_q.sql, r_engine), (l_q.sql, l_engine), r_on, l_on
+
+    first_df = pandas.read_sql(sql=first[0], con=create_engine(first[1]))
+    keys_df = first_df[first_on].dropna().drop_duplicates()
+    keys_df.columns = second_on
+    keys = keys_df.to_dict("records")
+    if keys == []:
+        second_df = pandas.read_sql(sql="SELECT * FROM ({}) sq WHERE 1 = 0".format(second[0]), con=create_engine(second[1]))
+    elif len(keys) <= max_in_list:
+        second_df = fetch_in_list(second[0], second[1], second_on, keys, max_in_list)
+    else:
+        second_df = fetch_temp_table(second[0], second[1], second_on, keys, keys_df)
+
+    if small == "left":
+        l_df, r_df = first_df, second_df
+    else:
+        l_df, r_df = second_df, first_df
+    return pandas.merge(l_df, r_df, how=how, left_on=l_on, right_on=r_on)
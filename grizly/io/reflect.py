@@ -0,0 +1,137 @@
+import json
+import os
+import time
+from sqlalchemy import create_engine, inspect, text, types
+from sqlalchemy.engine import make_url
+
+cache_path = os.path.join(os.path.expanduser("~"), ".grizly", "reflect_cache.json")
+_cache = {}
+
+
+def cache_key(engine_string, schema, table):
+    url = make_url(engine_string).render_as_string(hide_password=True)
+    return "{}|{}|{}".format(url, schema, table)
+
+
+def load_cache(path):
+    if path not in _cache:
+        try:
+            with open(path) as f:
+                _cache[path] = json.load(f)
+        except (OSError, ValueError):
+            _cache[path] = {}
+    return _cache[path]
+
+
+def save_cache(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = "{}.{}.tmp".format(path, os.getpid())
+    with open(tmp_path, "w") as f:
+        json.dump(_cache[path], f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def column_types(column, keys):
+    """
+    Maps SQLAlchemy column type to grizly type (dim or num) and pandas dtype.
+    Integer key columns are dims.
+    """
+    sql_type = column["type"]
+    if isinstance(sql_type, types.Integer):
+        return "dim" if column["name"] in keys else "num", "Int64"
+    if isinstance(sql_type, types.Numeric):
+        return "num", "float64"
+    if isinstance(sql_type, types.Boolean):
+        return "dim", "boolean"
+    if isinstance(sql_type, (types.Date, types.DateTime)):
+        return "dim", "datetime64[ns]"
+    return "dim", "object"
+
+
+def table_statistics(engine, schema, table, columns, pk):
+    """
+    Returns row count and a dictionary of distinct count estimates. Estimates come from
+    the database statistics (sqlite_stat1, pg_stats), columns without statistics are None.
+    """
+    full_name = "{}.{}".format(schema, table) if schema != "" else table
+    dialect = engine.dialect.name
+    distinct = {column: None for column in columns}
+    with engine.connect() as con:
+        if dialect == "postgresql":
+            sql = "SELECT c.reltuples FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace WHERE c.relname = :table AND n.nspname = :schema"
+            rows = con.execute(text(sql), {"table": table, "schema": schema or "public"}).scalar()
+        else:
+            rows = None
+        if rows is None or rows < 0:
+            rows = con.execute(text("SELECT COUNT(*) FROM {}".format(full_name))).scalar()
+        rows = int(rows)
+        if dialect == "postgresql":
+            sql = "SELECT attname, n_distinct FROM pg_stats WHERE tablename = :table AND schemaname = :schema"
+            for column, n_distinct in con.execute(text(sql), {"table": table, "schema": schema or "public"}):
+                distinct[column] = int(n_distinct if n_distinct >= 0 else -n_distinct * rows)
+        elif dialect == "sqlite":
+            try:
+                stats = con.execute(text("SELECT idx, stat FROM sqlite_stat1 WHERE tbl = :table AND idx IS NOT NULL"), {"table": table})
+                stats = stats.fetchall()
+            except Exception:
+                stats = []  # ANALYZE was never run
+            for idx, stat in stats:
+                index_columns = con.execute(text("PRAGMA index_info('{}')".format(idx))).fetchall()
+                stat = [int(n) for n in stat.split()]
+                if index_columns != [] and len(stat) > 1:
+                    distinct[index_columns[0][2]] = int(round(stat[0] / stat[1]))
+    if len(pk) == 1:
+        distinct[pk[0]] = rows
+    return rows, distinct
+
+
+def reflect_table(engine_string, schema, table):
+    """
+    Reads columns, their types, row count and distinct count estimates of a table.
+    """
+    engine = create_engine(engine_string)
+    inspector = inspect(engine)
+    columns = inspector.get_columns(table, schema=schema or None)
+    pk = inspector.get_pk_constraint(table, schema=schema or None)["constrained_columns"]
+    keys = list(pk)
+    for fk in inspector.get_foreign_keys(table, schema=schema or None):
+        keys += fk["constrained_columns"]
+    names = [column["name"] for column in columns]
+    rows, distinct = table_statistics(engine, schema, table, names, pk)
+    meta = {"columns": {}, "rows": rows, "reflected_at": time.time()}
+    for column in columns:
+        column_type, dtype = column_types(column, keys)
+        meta["columns"][column["name"]] = {
+            "sql_type": str(column["type"]),
+            "type": column_type,
+            "dtype": dtype,
+            "distinct": distinct[column["name"]],
+        }
+    return meta
+
+
+def table_stats(engine_string, schema, table, ttl=86400, path=None, refresh=False):
+    """
+    Returns reflected table metadata, from the cache if it's younger than ttl seconds.
+    The cache is kept in memory and in a json file (default ~/.grizly/reflect_cache.json).
+
+        >>> stats = table_stats(engine_string, "", "tracks")
+        >>> stats["rows"]
+        3503
+        >>> stats["columns"]["GenreId"]
+        {'sql_type': 'INTEGER', 'type': 'dim', 'dtype': 'Int64', 'distinct': 25}
+    """
+    path = path or cache_path
+    cache = load_cache(path)
+    key = cache_key(engine_string, schema, table)
+    if refresh or key not in cache or time.time() - cache[key]["reflected_at"] > ttl:
+        cache[key] = reflect_table(engine_string, schema, table)
+        save_cache(path)
+    return cache[key]
+
+
+def dtypes(stats):
+    """
+    Returns {column: pandas dtype} from table_stats, eg. for DataFrame.astype.
+    """
+    return {column: stats["columns"][column]["dtype"] for column in stats["columns"]}
@@ -0,0 +1,133 @@
+import os
+import shutil
+import tempfile
+import weakref
+import pandas
+from grizly.io.stream import iter_batches
+
+
+class ChunkedResult:
+    """
+    Lazy query result made of DataFrame chunks. Chunks which didn't fit into the
+    memory budget are stored in Arrow IPC files on local disk and memory-mapped
+    only when they are needed. Requires pyarrow if any chunk was spilled.
+
+            >>> result = q.to_sql(engine_string, memory_limit=500 * 1024 ** 2)
+            >>> len(result)
+            >>> for df in result:
+            ...     process(df)
+            >>> df = result[1000:2000]
+            >>> df = result.to_df()
+
+    Spill files are removed when the object is garbage collected or close() is called.
+    """
+
+    def __init__(self, columns, spill_dir=None):
+        self.columns = columns
+        self.chunks = []  # DataFrames or paths of spilled chunks
+        self.lengths = []
+        self.memory_usage = 0
+        self.sources = []
+        self.spill_dir = spill_dir  # parent directory of the spill files, default system temp
+        self.path = None
+        self._finalizer = None
+
+    def append(self, df, spill=False):
+        if spill:
+            import pyarrow as pa
+
+            if self.path is None:
+                self.path = tempfile.mkdtemp(prefix="grizly_", dir=self.spill_dir)
+                self._finalizer = weakref.finalize(self, shutil.rmtree, self.path, True)
+            path = os.path.join(self.path, "chunk_{}.arrow".format(len(self.chunks)))
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            with pa.OSFile(path, "wb") as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            self.chunks.append(path)
+        else:
+            self.chunks.append(df)
+            self.memory_usage += df.memory_usage(deep=True).sum()
+        self.lengths.append(len(df))
+
+    @property
+    def spilled(self):
+        return any(isinstance(chunk, str) for chunk in self.chunks)
+
+    def load_chunk(self, i, offset=0, length=None):
+        chunk = self.chunks[i]
+        if isinstance(chunk, str):
+            import pyarrow as pa
+
+            table = pa.ipc.open_file(pa.memory_map(chunk, "r")).read_all()
+            return table.slice(offset, length).to_pandas()
+        if length is None:
+            return chunk.iloc[offset:].reset_index(drop=True)
+        return chunk.iloc[offset : offset + length].reset_index(drop=True)
+
+    def __len__(self):
+        return sum(self.lengths)
+
+    def __iter__(self):
+        for i in range(len(self.chunks)):
+            yield self.load_chunk(i)
+
+    def __getitem__(self, key):
+        """
+        Returns rows start:stop as a DataFrame, only the chunks covering these rows are loaded.
+        """
+        if not isinstance(key, slice) or key.step not in [None, 1]:
+            raise TypeError("ChunkedResult can only be sliced with [start:stop].")
+        start, stop, _ = key.indices(len(self))
+        dfs = []
+        chunk_start = 0
+        for i, length in enumerate(self.lengths):
+            chunk_stop = chunk_start + length
+            if chunk_start < stop and chunk_stop > start:
+                offset = max(start - chunk_start, 0)
+                dfs.append(self.load_chunk(i, offset, min(stop, chunk_stop) - chunk_start - offset))
+            chunk_start = chunk_stop
+        if dfs == []:
+            return pandas.DataFrame(columns=self.columns)
+        return pandas.concat(dfs, ignore_index=True)
+
+    def to_df(self):
+        """
+        Loads all chunks into one DataFrame.
+        """
+        return self[:]
+
+    def close(self):
+        if self._finalizer is not None:
+            self._finalizer()
+
+
+def concat(results):
+    """
+    Concatenates ChunkedResults without loading their chunks.
+    """
+    result = ChunkedResult(columns=results[0].columns)
+    for _result in results:
+        result.chunks += _result.chunks
+        result.lengths += _result.lengths
+        result.memory_usage += _result.memory_usage
+    result.sources = list(results)  # keeps spill files of the sources alive
+    return result
+
+
+def to_sql_chunked(sql, engine_string, memory_limit, chunksize=10000, spill_dir=None):
+    """
+    Runs the sql statement and returns a ChunkedResult. Batches of chunksize rows are
+    kept in memory until their size exceeds memory_limit (bytes), next batches are
+    spilled to disk.
+    """
+    result = None
+    for columns, rows in iter_batches(sql, engine_string, chunksize=chunksize):
+        if result is None:
+            result = ChunkedResult(columns=columns, spill_dir=spill_dir)
+        if not rows:
+            continue  # empty result, only the columns are known
+        df = pandas.DataFrame.from_records(rows, columns=columns)
+        spill = result.memory_usage + df.memory_usage(deep=True).sum() > memory_limit
+        result.append(df, spill=spill)
+    return result
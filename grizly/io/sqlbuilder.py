@@ -1,6 +1,15 @@
 import sqlparse
 import pandas
-from sqlalchemy import create_engine
+import re
+from collections import OrderedDict
+from copy import deepcopy
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import OperationalError
+from grizly.io.execution import read_sql
+
+_preview_cache = OrderedDict()
+preview_cache_size = 32
 
 def to_col_name(data, field, agg="", noas=False):
     col_name = data["table"] + "." + field
@@ -44,9 +53,19 @@ def write(qf, table, drop=False):
     return sql
 
 
-def to_sql(sql, engine_string):
-    engine = create_engine(engine_string)
-    df = pandas.read_sql(sql=sql, con=engine)
+def to_sql(sql, engine_string, timeout=None, retries=0, backoff=1, handle=None):
+    """
+    Runs the sql statement and returns a pandas DataFrame.
+    See grizly.io.execution.read_sql for timeout, retries, backoff and handle.
+    """
+    df = read_sql(sql, engine_string, timeout=timeout, retries=retries, backoff=backoff, handle=handle)
+    return format_floats(df)
+
+
+def format_floats(df):
+    """
+    Formats float columns of a query result as rounded numbers with thousands separators.
+    """
     for col in df:
         coltype = df[col].dtype
         if coltype in ["float64"]:
@@ -54,6 +73,195 @@ def to_sql(sql, engine_string):
     return df
 
 
+def sql_aliases(sql):
+    """
+    Returns a dictionary {alias: table} of tables in FROM and JOIN clauses of the sql statement.
+    """
+    keywords = "WHERE JOIN INNER LEFT RIGHT FULL CROSS NATURAL OUTER ON USING GROUP ORDER HAVING LIMIT UNION TABLESAMPLE"
+    keywords = keywords.split()
+    aliases = {}
+    for table, alias in re.findall(r'\b(?:FROM|JOIN)\s+"?([\w.]+)"?(?:\s+(?:AS\s+)?(\w+))?', sql, flags=re.IGNORECASE):
+        table = table.split(".")[-1]
+        if alias != "" and alias.upper() not in keywords:
+            aliases[alias] = table
+    return aliases
+
+
+def table_rows(engine, table):
+    """
+    Returns the estimated number of rows of a SQLite table from sqlite_stat1 (written
+    by ANALYZE) or, if the table has no statistics, its largest rowid (read from the
+    index, deleted rows are counted too). Returns None for WITHOUT ROWID tables
+    without statistics.
+    """
+    with engine.connect() as con:
+        try:
+            stat = con.execute(text("SELECT stat FROM sqlite_stat1 WHERE tbl = :table"), {"table": table}).scalar()
+        except OperationalError:
+            stat = None  # ANALYZE was never run
+        if stat is not None:
+            return int(stat.split()[0])
+        try:
+            return con.execute(text('SELECT MAX(rowid) FROM "{}"'.format(table))).scalar() or 0
+        except OperationalError:
+            return None
+
+
+def explain(sql, engine_string, large_table=100000):
+    """
+    Runs the dialect's EXPLAIN (EXPLAIN QUERY PLAN on SQLite) for the sql
+    statement and returns a dictionary with keys:
+        * plan: list of plan steps, each step is a dictionary with a "detail" key,
+        on SQLite full table scans have a "table" key with the scanned table (aliases resolved)
+        * warnings: list of flagged steps - full scans on tables with at least
+        large_table rows, joins not using an index and temp B-tree sorts
+        * cost: on SQLite the estimated number of rows read by full table scans, on
+        PostgreSQL the planner's total cost, otherwise None
+
+    On SQLite row counts are estimated from sqlite_stat1 or the largest rowid, tables
+    are not counted; scans of tables without an estimate add no cost. A LIMIT at the end of a query which reads one table without filtering,
+    grouping, sorting or aggregating caps the cost, otherwise LIMIT is ignored.
+    """
+    engine = create_engine(engine_string)
+    dialect = engine.dialect.name
+    flags = []
+    cost = None
+    if dialect == "sqlite":
+        plan = pandas.read_sql(sql="EXPLAIN QUERY PLAN " + sql, con=engine)
+        plan = plan[["id", "parent", "detail"]].to_dict("records")
+        tables = pandas.read_sql(sql="SELECT name FROM sqlite_master WHERE type='table'", con=engine)
+        tables = set(tables["name"])
+        aliases = sql_aliases(sql)
+        limit = re.search(r"\bLIMIT\s+(\d+)\s*;?\s*$", sql, flags=re.IGNORECASE)
+        scans = [step for step in plan if step["detail"].startswith("SCAN")]
+        sorts = [step for step in plan if "TEMP B-TREE" in step["detail"]]
+        aggregates = re.search(
+            r"\b(WHERE|GROUP\s+BY|HAVING|DISTINCT|JOIN|UNION)\b|\b(COUNT|SUM|AVG|MIN|MAX|TOTAL|GROUP_CONCAT)\s*\(",
+            sql,
+            flags=re.IGNORECASE,
+        )
+        limit = int(limit.group(1)) if limit and len(scans) == 1 and sorts == [] and not aggregates else None
+        cost = 0
+        loops = {}
+        for step in plan:
+            detail = step["detail"]
+            # SCAN t, SCAN main.tracks, SCAN tracks AS t (older versions: SCAN TABLE tracks AS t)
+            scan = re.match(r"SCAN (?:TABLE )?(?:\w+\.)?(\w+)(?: AS (\w+))?", detail)
+            if scan or detail.startswith("SEARCH"):
+                loops[step["parent"]] = loops.get(step["parent"], 0) + 1
+            if scan and "INDEX" not in detail:
+                table = scan.group(1)
+                if scan.group(2) is None and table in aliases:
+                    table = aliases[table]
+                rows = table_rows(engine, table) if table in tables else None
+                if rows is not None:
+                    step["table"] = table
+                    if limit is not None:
+                        rows = min(rows, limit)
+                    cost += rows
+                    if rows >= large_table:
+                        flags.append("Full table scan on {} ({} rows)".format(table, rows))
+                if loops[step["parent"]] > 1:
+                    flags.append("Join without index: {}".format(detail))
+            if "AUTOMATIC" in detail:
+                flags.append("Join without index: {}".format(detail))
+            if "TEMP B-TREE" in detail:
+                flags.append("Temp B-tree sort: {}".format(detail))
+    else:
+        plan = pandas.read_sql(sql="EXPLAIN " + sql, con=engine)
+        plan = [{"detail": str(line)} for line in plan.iloc[:, 0]]
+        if dialect == "postgresql":
+            for step in plan:
+                detail = step["detail"]
+                step_cost = re.search(r"cost=[\d.]+\.\.([\d.]+) rows=(\d+)", detail)
+                if step_cost and cost is None:
+                    cost = float(step_cost.group(1))
+                scan = re.search(r"Seq Scan on (\w+)", detail)
+                if scan and step_cost and int(step_cost.group(2)) >= large_table:
+                    flags.append("Full table scan on {} ({} rows)".format(scan.group(1), step_cost.group(2)))
+                if "Join Filter:" in detail:
+                    flags.append("Join without index: {}".format(detail.strip()))
+                if re.search(r"->\s+Sort|^Sort", detail.strip()):
+                    flags.append("Sort: {}".format(detail.strip()))
+    return {"plan": plan, "warnings": flags, "cost": cost}
+
+
+def clear_preview_cache():
+    """
+    Removes all cached results of head() and sample().
+    """
+    _preview_cache.clear()
+
+
+def samples_result_rows(qf):
+    """
+    Returns True if sampling table rows with TABLESAMPLE samples the result rows of
+    the QFrame, ie. it has no aggregations, having, distinct, topn or limit.
+    """
+    data = qf.data
+    if any(data["fields"][field].get("group_by", "") != "" for field in data["fields"]):
+        return False
+    return not any(data.get(key) for key in ["having", "distinct", "topn", "limit"])
+
+
+def preview(qf, engine_string, n=None, frac=None, sample=False, cache=True):
+    """
+    Runs the sql statement wrapped in a subquery which returns only n rows
+    (or, if sample is True, a frac fraction of rows) and returns a pandas DataFrame.
+    qf.data is not modified.
+
+    If sample is True rows are chosen randomly: with TABLESAMPLE on the table
+    (PostgreSQL, SQL Server), with a random filter on the result (frac) or with
+    ORDER BY RANDOM() (n). TABLESAMPLE samples table rows, not result rows, so it's
+    used only for QFrames without aggregations, having, distinct, topn and limit
+    and only if qf.sql was not edited after get_sql().
+
+    Results of the last preview_cache_size previews are cached by engine_string and
+    sql so repeated previews don't hit the database, set cache=False to rerun the
+    query or use clear_preview_cache().
+    """
+    dialect = make_url(engine_string).get_backend_name()
+    sql = qf.sql
+    if sample and frac is not None:
+        if dialect in ["postgresql", "mssql"] and samples_result_rows(qf) and sql == get_sql(deepcopy(qf)).sql:
+            percent = frac * 100
+            _qf = deepcopy(qf)
+            if dialect == "postgresql":
+                _qf.data["tablesample"] = "BERNOULLI ({})".format(percent)
+            else:
+                _qf.data["tablesample"] = "SYSTEM ({} PERCENT)".format(percent)
+            sql = get_sql(_qf).sql
+        else:
+            if dialect == "sqlite":
+                # RANDOM() returns a 64-bit integer in SQLite
+                condition = "ABS(RANDOM() % 1000000) < {}".format(int(frac * 1000000))
+            elif dialect == "mssql":
+                condition = "ABS(CHECKSUM(NEWID())) % 1000000 < {}".format(int(frac * 1000000))
+            elif dialect == "mysql":
+                condition = "RAND() < {}".format(frac)
+            else:
+                condition = "RANDOM() < {}".format(frac)
+            sql = "SELECT * FROM ({}) sq WHERE {}".format(sql, condition)
+    if n is not None:
+        if sample:
+            random = {"mysql": "RAND()", "mssql": "NEWID()"}.get(dialect, "RANDOM()")
+            order = " ORDER BY {}".format(random)
+        else:
+            order = ""
+        if dialect == "mssql":
+            sql = "SELECT TOP {} * FROM ({}) sq{}".format(n, sql, order)
+        else:
+            sql = "SELECT * FROM ({}) sq{} LIMIT {}".format(sql, order, n)
+
+    key = (engine_string, sql)
+    if not cache or key not in _preview_cache:
+        _preview_cache[key] = to_sql(sql, engine_string)
+        while len(_preview_cache) > preview_cache_size:
+            _preview_cache.popitem(last=False)
+    _preview_cache.move_to_end(key)
+    return _preview_cache[key].copy()
+
+
 def build_column_strings(qf):
     fields = {}
     expressions = {}
@@ -104,23 +312,72 @@ def build_column_strings(qf):
                                 , "group_dimensions":group_dimensions, "group_values":group_values}
     return qf
 
+def get_alias(data, field):
+    """
+    Returns the name of the field in the result of the query, eg. sum_Value for
+    a field aggregated with sum. Names which are not fields are returned unchanged.
+    """
+    if field not in data["fields"]:
+        return field
+    attrs = data["fields"][field]
+    if "expression" in attrs:
+        return field
+    if attrs.get("group_by", "") not in ["", "group"]:
+        return "{}_{}".format(attrs["group_by"], field)
+    if "as" in attrs:
+        return attrs["as"]
+    return field
+
+
+def get_order(data, fields, ascending):
+    if isinstance(ascending, bool):
+        ascending = [ascending] * len(fields)
+    return ", ".join(
+        "{} {}".format(get_alias(data, field), "ASC" if asc else "DESC") for field, asc in zip(fields, ascending)
+    )
+
+
 def get_sql(qf):
     # TODO: In case of joins we should use somewhere select_aliases.
     qf.create_sql_blocks()
     data = qf.data
     selects = ', '.join(data['sql_blocks']['select_names']+data['sql_blocks']['group_values'])
-    sql = "SELECT {}".format(selects)
-    if "schema" in data and data["schema"] != "":
+    if data.get("distinct"):
+        sql = "SELECT DISTINCT {}".format(selects)
+    else:
+        sql = "SELECT {}".format(selects)
+    if "source" in data:
+        # eg. a temporary table with the table's rows, aliased as the table
+        sql += " FROM {} {}".format(data["source"], data["table"])
+    elif "schema" in data and data["schema"] != "":
         sql += " FROM {}.{}".format(data["schema"],data["table"])
     else: 
         sql += " FROM {}".format(data["table"])
+    if "tablesample" in data:
+        sql += " TABLESAMPLE {}".format(data["tablesample"])
     if "where" in data:
             sql += " WHERE {}".format(data["where"])
     if data['sql_blocks']['group_dimensions'] != []:
         group_names = ', '.join(data['sql_blocks']['group_dimensions'])
         sql += " GROUP BY {}".format(group_names)
+    if "having" in data:
+        sql += " HAVING {}".format(data["having"])
+    if "topn" in data:
+        # rank rows with a window function in a subquery and keep the first n in each group
+        topn = data["topn"]
+        outputs = []
+        for name in data['sql_blocks']['select_names'] + data['sql_blocks']['group_values']:
+            outputs.append(name.split(" as ")[-1] if " as " in name else name.split(".")[-1])
+        over = "ORDER BY {}".format(get_order(data, topn["by"], topn["ascending"]))
+        if topn["per"] != []:
+            over = "PARTITION BY {} {}".format(", ".join(get_alias(data, field) for field in topn["per"]), over)
+        sql = "SELECT {} FROM (SELECT sq.*, ROW_NUMBER() OVER ({}) AS grizly_rank FROM ({}) sq) sq WHERE grizly_rank <= {}".format(
+            ", ".join(outputs), over, sql, topn["n"]
+        )
+    if "orderby" in data:
+        sql += " ORDER BY {}".format(get_order(data, data["orderby"]["fields"], data["orderby"]["ascending"]))
     if "limit" in data:
         sql += " LIMIT {}".format(data["limit"])
     sql = sqlparse.format(sql, reindent=True, keyword_case="upper")
     qf.sql = sql
-    return qf
\ No newline at end of file
+    return qf
@@ -0,0 +1,250 @@
+import csv
+import os
+import numpy
+from sqlalchemy import create_engine
+
+
+def iter_batches(sql, engine_string, chunksize=10000):
+    """
+    Runs the sql statement and yields the result in batches of at most chunksize rows
+    as (columns, rows) tuples. Rows are fetched from a server side cursor where the
+    driver supports it so only one batch is held in memory. An empty result yields
+    one batch without rows so the columns are known.
+    """
+    engine = create_engine(engine_string)
+    with engine.connect() as con:
+        result = con.execution_options(stream_results=True).exec_driver_sql(sql)
+        columns = list(result.keys())
+        empty = True
+        while True:
+            rows = result.fetchmany(chunksize)
+            if not rows:
+                break
+            empty = False
+            yield columns, rows
+        if empty:
+            yield columns, []
+
+
+def partition_path(path, column, value, extension):
+    """
+    Returns the file path of a partition, eg. path/Country=Italy/part-0.csv
+    """
+    directory = os.path.join(path, "{}={}".format(column, value))
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, "part-0.{}".format(extension))
+
+
+def split_partitions(columns, rows, partition_by):
+    """
+    Splits rows by the value of partition_by column and removes this column from the rows.
+    Returns the remaining columns and a dictionary {value: rows}.
+    """
+    index = columns.index(partition_by)
+    columns = columns[:index] + columns[index + 1 :]
+    partitions = {}
+    for row in rows:
+        partitions.setdefault(row[index], []).append(tuple(row[:index]) + tuple(row[index + 1 :]))
+    return columns, partitions
+
+
+def arrow_array(values):
+    """
+    Builds a pyarrow Array with the type inferred from values. Columns with mixed
+    types (eg. numbers and text in one SQLite column) are stored as strings.
+    """
+    import pyarrow as pa
+
+    try:
+        return pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return pa.array([None if value is None else str(value) for value in values], pa.string())
+
+
+def widen_schema(schema, other):
+    """
+    Returns schema with the types of each field widened to hold values of other
+    as well, eg. null and double -> double, int64 and double -> double. Fields which
+    can't be unified become strings.
+    """
+    import pyarrow as pa
+
+    fields = []
+    for field, other_field in zip(schema, other):
+        try:
+            unified = pa.unify_schemas([pa.schema([field]), pa.schema([other_field])], promote_options="permissive")
+            fields.append(unified.field(0))
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            fields.append(pa.field(field.name, pa.string()))
+    return pa.schema(fields)
+
+
+def arrow_table(columns, rows, schema=None):
+    """
+    Builds a pyarrow Table from rows, column by column, with types inferred from the
+    rows. If schema of the previous batches is given the types are widened to fit both
+    (eg. a column which had only NULLs so far gets the type of its first values).
+    Returns the table and the (possibly widened) schema, when it differs from the
+    given schema tables built before should be cast to it.
+    """
+    import pyarrow as pa
+
+    values = list(zip(*rows)) or [() for column in columns]
+    table = pa.Table.from_arrays([arrow_array(values[i]) for i in range(len(columns))], names=columns)
+    if schema is not None and table.schema != schema:
+        schema = widen_schema(schema, table.schema)
+        table = table.cast(schema)
+    return table, table.schema
+
+
+def rewrite_parquet(writer, path, schema, compression):
+    """
+    Closes the writer and rewrites the file with a wider schema, row group by row group.
+    Returns a new writer which appends to the file.
+    """
+    import pyarrow.parquet as pq
+
+    writer.close()
+    tmp_path = path + ".tmp"
+    os.replace(path, tmp_path)
+    writer = pq.ParquetWriter(path, schema, compression=compression)
+    with pq.ParquetFile(tmp_path) as parquet_file:
+        for i in range(parquet_file.num_row_groups):
+            writer.write_table(parquet_file.read_row_group(i).cast(schema))
+    os.remove(tmp_path)
+    return writer
+
+
+def numpy_column(values):
+    """
+    Converts a column of a batch to a NumPy array. Numbers get a numeric dtype,
+    strings and columns with NULLs are stored as objects.
+    """
+    array = numpy.array(values)
+    if array.dtype.kind in "USO" or array.ndim != 1:
+        array = numpy.empty(len(values), dtype=object)
+        array[:] = values
+    return array
+
+
+def to_arrow(sql, engine_string, chunksize=10000):
+    """
+    Runs the sql statement and builds a pyarrow Table directly from cursor batches,
+    without creating a DataFrame. Types are inferred from the batches and widened
+    when a later batch needs it, an empty result gives a table without rows (columns
+    of null type). Requires pyarrow.
+    """
+    import pyarrow as pa
+
+    schema = None
+    tables = []
+    for columns, rows in iter_batches(sql, engine_string, chunksize=chunksize):
+        table, schema = arrow_table(columns, rows, schema)
+        tables.append(table)
+    return pa.concat_tables([table.cast(schema) for table in tables])
+
+
+def to_numpy(sql, engine_string, chunksize=10000):
+    """
+    Runs the sql statement and returns a dictionary {column: NumPy array} built
+    directly from cursor batches, without creating a DataFrame. An empty result
+    gives zero-length arrays.
+    """
+    columns = []
+    arrays = {}
+    for columns, rows in iter_batches(sql, engine_string, chunksize=chunksize):
+        values = list(zip(*rows)) or [() for column in columns]
+        for i, column in enumerate(columns):
+            arrays.setdefault(column, []).append(numpy_column(values[i]))
+    return {column: numpy.concatenate(arrays[column]) for column in columns}
+
+
+def to_csv(sql, engine_string, path, chunksize=10000, partition_by="", sep=","):
+    """
+    Streams the result of the sql statement into a csv file without building a DataFrame.
+
+    partition_by: column name, if specified path is a directory and rows are written into
+        path/column=value/part-0.csv files, one for each value of the column.
+
+    An empty result writes a file with the header only (an empty directory if partitioned).
+
+    Returns the number of rows written.
+    """
+    files = {}
+    writers = {}
+    rows_count = 0
+    if partition_by != "":
+        os.makedirs(path, exist_ok=True)
+    try:
+        for columns, rows in iter_batches(sql, engine_string, chunksize=chunksize):
+            if partition_by != "":
+                columns, partitions = split_partitions(columns, rows, partition_by)
+            else:
+                partitions = {None: rows}
+            for value in partitions:
+                if value not in writers:
+                    if partition_by != "":
+                        file_path = partition_path(path, partition_by, value, "csv")
+                    else:
+                        file_path = path
+                    files[value] = open(file_path, "w", newline="", encoding="utf-8")
+                    writers[value] = csv.writer(files[value], delimiter=sep)
+                    writers[value].writerow(columns)
+                writers[value].writerows(partitions[value])
+            rows_count += len(rows)
+    finally:
+        for value in files:
+            files[value].close()
+    return rows_count
+
+
+def to_parquet(sql, engine_string, path, chunksize=10000, compression="snappy", partition_by=""):
+    """
+    Streams the result of the sql statement into a parquet file without building a DataFrame.
+    Requires pyarrow.
+
+    chunksize: number of rows fetched from the database at once, each batch is written
+        as a separate row group.
+    compression: parquet compression codec, eg. snappy, gzip, zstd or none.
+    partition_by: column name, if specified path is a directory and rows are written into
+        path/column=value/part-0.parquet files, one for each value of the column.
+
+    Types are inferred from the batches. When a later batch needs a wider type (eg. a
+    column which had only NULLs so far) the files written so far are rewritten with the
+    wider schema. Columns which have only NULLs are stored with the null type. An empty
+    result writes a file without rows (an empty directory if partitioned).
+
+    Returns the number of rows written.
+    """
+    import pyarrow.parquet as pq
+
+    schema = None
+    writers = {}
+    file_paths = {}
+    rows_count = 0
+    if partition_by != "":
+        os.makedirs(path, exist_ok=True)
+    try:
+        for columns, rows in iter_batches(sql, engine_string, chunksize=chunksize):
+            if partition_by != "":
+                columns, partitions = split_partitions(columns, rows, partition_by)
+            else:
+                partitions = {None: rows}
+            for value in partitions:
+                previous_schema = schema
+                table, schema = arrow_table(columns, partitions[value], schema)
+                if previous_schema is not None and schema != previous_schema:
+                    for _value in writers:
+                        writers[_value] = rewrite_parquet(writers[_value], file_paths[_value], schema, compression)
+                if value not in writers:
+                    if partition_by != "":
+                        file_paths[value] = partition_path(path, partition_by, value, "parquet")
+                    else:
+                        file_paths[value] = path
+                    writers[value] = pq.ParquetWriter(file_paths[value], schema, compression=compression)
+                writers[value].write_table(table)
+            rows_count += len(rows)
+    finally:
+        for value in writers:
+            writers[value].close()
+    return rows_count
@@ -1,8 +1,23 @@
 import pytest
 import sqlparse
-from ..api import QFrame, union, join
-from ..io.sqlbuilder import write, build_column_strings, get_sql
+from ..api import QFrame, union, join, federated_join, to_sql_batch, clear_preview_cache
+from ..io import sqlbuilder
+from ..io.sqlbuilder import write, build_column_strings, get_sql, explain
+from ..io.spill import concat
+from ..io import reflect
+from ..io.reflect import table_stats
+from ..io.catalog import compile_catalog
 import os
+import json
+import shutil
+from copy import deepcopy
+import threading
+import time
+from concurrent.futures import CancelledError
+import sqlite3
+import numpy
+import pandas
+from sqlalchemy import create_engine
 
 
 
@@ -285,3 +300,454 @@ def test_get_sql_with_select_attr():
     sql = q.get_sql().sql
     assert clean_testexpr(sql) == clean_testexpr(testsql)
     # write_out(str(sql))
+
+def test_explain():
+    tracks = {
+        "fields": {
+            "TrackId": {"type": "dim"},
+            "Name": {"type": "dim"},
+            "UnitPrice": {"type": "num"},
+        },
+        "table": "tracks",
+    }
+    engine = "sqlite:///" + os.path.join(os.getcwd(), "grizly", "tests", "chinook.db")
+    q = QFrame().from_dict(tracks).get_sql()
+    q.sql += " ORDER BY Name"
+    plan = q.explain(engine_string=engine, large_table=1000)
+    assert plan["plan"][0]["table"] == "tracks"
+    assert plan["warnings"] == ["Full table scan on tracks (3503 rows)", "Temp B-tree sort: USE TEMP B-TREE FOR ORDER BY"]
+    assert plan["cost"] == 3503
+
+def test_explain_alias_and_limit():
+    engine = "sqlite:///" + os.path.join(os.getcwd(), "grizly", "tests", "chinook.db")
+    plan = explain("SELECT t.Name FROM tracks t", engine, large_table=1000)
+    assert plan["warnings"] == ["Full table scan on tracks (3503 rows)"]
+    assert plan["cost"] == 3503
+    q = QFrame().from_dict({"fields": {"Name": {"type": "dim"}}, "schema": "main", "table": "tracks"}).get_sql()
+    assert q.explain(engine_string=engine, large_table=1000)["cost"] == 3503
+    with pytest.raises(ValueError):
+        q.to_sql(engine_string=engine, guard="raise", max_cost=1000)
+    plan = explain("SELECT * FROM tracks LIMIT 10", engine, large_table=1000)
+    assert plan["warnings"] == []
+    assert plan["cost"] == 10
+    plan = explain("SELECT * FROM tracks ORDER BY Name LIMIT 10", engine, large_table=1000)
+    assert plan["cost"] == 3503
+
+def test_to_sql_guard():
+    tracks = {
+        "fields": {
+            "TrackId": {"type": "dim"},
+            "Name": {"type": "dim"},
+        },
+        "table": "tracks",
+    }
+    engine = "sqlite:///" + os.path.join(os.getcwd(), "grizly", "tests", "chinook.db")
+    q = QFrame().from_dict(tracks).get_sql()
+    with pytest.raises(ValueError):
+        q.to_sql(engine_string=engine, guard="raise", max_cost=1000)
+    with pytest.warns(UserWarning):
+        q.to_sql(engine_string=engine, guard="warn", max_cost=1000)
+    assert len(q.to_sql(engine_string=engine, guard="raise", max_cost=5000)) == 3503
+
+def test_head_and_sample():
+    tracks = {
+        "fields": {
+            "TrackId": {"type": "dim"},
+            "Name": {"type": "dim"},
+        },
+        "table": "tracks",
+    }
+    engine = "sqlite:///" + os.path.join(os.getcwd(), "grizly", "tests", "chinook.db")
+    q = QFrame().from_dict(tracks).limit(100).get_sql()
+    assert len(q.head(10, engine_string=engine)) == 10
+    assert q.data["limit"] == "100"
+    sample = q.sample(n=20, engine_string=engine)
+    assert len(sample) == 20
+    assert q.sample(n=20, engine_string=engine).equals(sample)
+    sample = q.sample(frac=0.5, engine_string=engine, cache=False)
+    assert 0 < len(sample) < 100
+    with pytest.raises(ValueError):
+        q.sample(n=1, frac=0.5, engine_string=engine)
+
+def test_preview_cache():
+    engine = "sqlite:///" + os.path.join(os.getcwd(), "grizly", "tests", "chinook.db")
+    q = QFrame().from_dict({"fields": {"TrackId": {"type": "dim"}}, "table": "tracks"}).get_sql()
+    clear_preview_cache()
+    for n in range(sqlbuilder.preview_cache_size + 5):
+        q.head(n + 1, engine_string=engine)
+    assert len(sqlbuilder._preview_cache) == sqlbuilder.preview_cache_size
+    assert (engine, "SELECT * FROM ({}) sq LIMIT 1".format(q.sql)) not in sqlbuilder._preview_cache
+    clear_preview_cache()
+    assert len(sqlbuilder._preview_cache) == 0
+
+def test_sample_tablesample(monkeypatch):
+    sqls = []
+    monkeypatch.setattr(sqlbuilder, "to_sql", lambda sql, engine_string: sqls.append(sql) or pandas.DataFrame())
+    q = QFrame().from_dict({"fields": {"TrackId": {"type": "dim"}}, "table": "tracks"}).get_sql()
+    q.sample(frac=0.1, engine_string="postgresql://localhost/db", cache=False)
+    assert "TABLESAMPLE BERNOULLI (10.0)" in sqls[-1]
+    q.sql += " WHERE TrackId > 10"
+    q.sample(frac=0.1, engine_string="postgresql://localhost/db", cache=False)
+    assert sqls[-1] == "SELECT * FROM ({}) sq WHERE RANDOM() < 0.1".format(q.sql)
+    q = QFrame().from_dict({"fields": {"GenreId": {"type": "dim"}, "Bytes": {"type": "num"}}, "table": "tracks"})
+    q.groupby(["GenreId"])["Bytes"].agg("sum").get_sql()
+    q.sample(frac=0.1, engine_string="mssql://localhost/db", cache=False)
+    assert sqls[-1] == "SELECT * FROM ({}) sq WHERE ABS(CHECKSUM(NEWID())) % 1000000 < 100000".format(q.sql)
+
+def test_to_csv_and_parquet(tmp_path):
+    tracks = {
+        "fields": {
+            "TrackId": {"type": "dim"},
+            "Name": {"type": "dim"},
+            "GenreId": {"type": "dim"},
+            "UnitPrice": {"type": "num"},
+        },
+        "table": "tracks",
+    }
+    engine = "sqlite:///" + os.path.join(os.getcwd(), "grizly", "tests", "chinook.db")
+    q = QFrame().from_dict(tracks).get_sql()
+    df = pandas.read_sql(sql=q.sql, con=create_engine(engine))
+
+    q.to_csv(str(tmp_path / "tracks.csv"), engine_string=engine, chunksize=1000)
+    assert pandas.read_csv(tmp_path / "tracks.csv").equals(df)
+
+    q.to_parquet(str(tmp_path / "tracks.parquet"), engine_string=engine, chunksize=1000)
+    assert pandas.read_parquet(tmp_path / "tracks.parquet").equals(df)
+
+    q.to_parquet(str(tmp_path / "genres"), engine_string=engine, chunksize=1000, partition_by="GenreId")
+    rock = pandas.read_parquet(tmp_path / "genres" / "GenreId=1" / "part-0.parquet")
+    assert len(rock) == len(df[df["GenreId"] == 1])
+    assert "GenreId" not in rock
+
+def get_empty_query():
+    tracks = {"fields": {"TrackId": {"type": "dim"}, "Name": {"type": "dim"}}, "table": "tracks"}
+    return QFrame().from_dict(tracks).query("tracks.TrackId < 0").get_sql()
+
+def test_to_csv_and_parquet_empty(tmp_path):
+    engine = "sqlite:///" + os.path.join(os.getcwd(), "grizly", "tests", "chinook.db")
+    q = get_empty_query()
+    q.to_csv(str(tmp_path / "empty.csv"), engine_string=engine)
+    with open(str(tmp_path / "empty.csv")) as f:
+        assert f.read() == "TrackId,Name\n"
+    q.to_parquet(str(tmp_path / "empty.parquet"), engine_string=engine)
+    df = pandas.read_parquet(tmp_path / "empty.parquet")
+    assert list(df.columns) == ["TrackId", "Name"] and len(df) == 0
+    q.to_parquet(str(tmp_path / "names"), engine_string=engine, partition_by="Name")
+    assert os.listdir(str(tmp_path / "names")) == []
+
+def test_to_sql_arrow_and_numpy_empty():
+    engine = "sqlite:///" + os.path.join(os.getcwd(), "grizly", "tests", "chinook.db")
+    q = get_empty_query()
+    table = q.to_sql(engine_string=engine, format="arrow")
+    assert table.column_names == ["TrackId", "Name"] and table.num_rows == 0
+    arrays = q.to_sql(engine_string=engine, format="numpy")
+    assert list(arrays) == ["TrackId", "Name"]
+    assert all(len(arrays[column]) == 0 for column in arrays)
+
+def test_to_sql_memory_limit_empty():
+    engine = "sqlite:///" + os.path.join(os.getcwd(), "grizly", "tests", "chinook.db")
+    result = get_empty_query().to_sql(engine_string=engine, memory_limit=100000)
+    assert len(result) == 0
+    assert list(result.to_df().columns) == ["TrackId", "Name"]
+
+def test_to_sql_memory_limit():
+    tracks = {
+        "fields": {
+            "TrackId": {"type": "dim"},
+            "Name": {"type": "dim"},
+            "UnitPrice": {"type": "num"},
+        },
+        "table": "tracks",
+    }
+    engine = "sqlite:///" + os.path.join(os.getcwd(), "grizly", "tests", "chinook.db")
+    q = QFrame().from_dict(tracks).get_sql()
+    df = pandas.read_sql(sql=q.sql, con=create_engine(engine))
+    result = q.to_sql(engine_string=engine, memory_limit=100000, chunksize=500)
+    assert result.spilled
+    assert len(result) == 3503
+    assert [len(chunk) for chunk in result] == [500] * 7 + [3]
+    assert result[450:1600].equals(df[450:1600].reset_index(drop=True))
+    assert result.to_df().equals(df)
+    assert len(concat([result, result])) == 7006
+    path = result.path
+    result.close()
+    assert not os.path.exists(path)
+
+def test_federated_join(tmp_path):
+    genres_db = str(tmp_path / "genres.db")
+    con = sqlite3.connect(genres_db)
+    con.execute("CREATE TABLE genres (GenreId INTEGER, Name TEXT)")
+    con.executemany("INSERT INTO genres VALUES (?, ?)", [(1, "Rock"), (2, "Jazz"), (99, "Unknown")])
+    con.commit()
+    con.close()
+    genres = {"fields": {"GenreId": {"type": "dim"}, "Name": {"type": "dim", "as": "Genre"}}, "table": "genres"}
+    tracks = {"fields": {"TrackId": {"type": "dim"}, "GenreId": {"type": "dim"}}, "table": "tracks"}
+    l_engine = "sqlite:///" + genres_db
+    r_engine = "sqlite:///" + os.path.join(os.getcwd(), "grizly", "tests", "chinook.db")
+    genres_qf = QFrame().from_dict(genres).get_sql()
+    tracks_qf = QFrame().from_dict(tracks).get_sql()
+    tracks_df = pandas.read_sql(sql=tracks_qf.sql, con=create_engine(r_engine))
+    expected = len(tracks_df[tracks_df["GenreId"].isin([1, 2])])
+
+    df = federated_join(genres_qf, tracks_qf, on=[("GenreId", "GenreId")], l_engine=l_engine, r_engine=r_engine)
+    assert len(df) == expected
+    assert set(df["Genre"]) == {"Rock", "Jazz"}
+
+    df = federated_join(
+        genres_qf, tracks_qf, on=[("GenreId", "GenreId")], l_engine=l_engine, r_engine=r_engine, max_in_list=1
+    )
+    assert len(df) == expected
+
+    df = federated_join(genres_qf, tracks_qf, on=[("GenreId", "GenreId")], l_engine=l_engine, r_engine=r_engine, how="left")
+    assert len(df) == expected + 1
+
+def test_from_table(tmp_path):
+    engine = "sqlite:///" + os.path.join(os.getcwd(), "grizly", "tests", "chinook.db")
+    cache_path = str(tmp_path / "reflect_cache.json")
+    q = QFrame().from_table(engine, schema="", table="tracks", cache_path=cache_path)
+    assert q.data["fields"]["TrackId"] == {"type": "dim"}
+    assert q.data["fields"]["GenreId"] == {"type": "dim"}
+    assert q.data["fields"]["Milliseconds"] == {"type": "num"}
+    assert q.data["fields"]["UnitPrice"] == {"type": "num"}
+    assert q.data["fields"]["Name"] == {"type": "dim"}
+    assert len(q.get_sql().to_sql()) == 3503
+
+    stats = table_stats(engine, "", "tracks", path=cache_path)
+    assert stats["rows"] == 3503
+    assert stats["columns"]["GenreId"]["distinct"] == 25
+    assert stats["columns"]["TrackId"]["distinct"] == 3503
+    reflected_at = stats["reflected_at"]
+    assert table_stats(engine, "", "tracks", path=cache_path)["reflected_at"] == reflected_at
+    assert table_stats(engine, "", "tracks", path=cache_path, ttl=0)["reflected_at"] > reflected_at
+
+def get_endless_query():
+    q = QFrame().from_dict({"fields": {"x": {"type": "num"}}, "table": "c"})
+    q.sql = "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c) SELECT COUNT(c.x) AS x FROM c"
+    return q
+
+def test_to_sql_timeout():
+    engine = "sqlite:///" + os.path.join(os.getcwd(), "grizly", "tests", "chinook.db")
+    q = get_endless_query()
+    start = time.time()
+    with pytest.raises(TimeoutError):
+        q.to_sql(engine_string=engine, timeout=0.2, retries=3)
+    assert time.time() - start < 5
+
+def test_to_sql_async_cancel():
+    engine = "sqlite:///" + os.path.join(os.getcwd(), "grizly", "tests", "chinook.db")
+    handle = get_endless_query().to_sql_async(engine_string=engine)
+    time.sleep(0.2)
+    assert not handle.done()
+    handle.cancel()
+    with pytest.raises(CancelledError):
+        handle.result(timeout=5)
+
+def test_to_sql_retries(tmp_path):
+    db = str(tmp_path / "locked.db")
+    con = sqlite3.connect(db, check_same_thread=False)
+    con.execute("CREATE TABLE t (x INTEGER)")
+    con.execute("INSERT INTO t VALUES (1)")
+    con.commit()
+    con.execute("BEGIN EXCLUSIVE")
+    threading.Timer(0.3, con.rollback).start()
+    q = QFrame().from_dict({"fields": {"x": {"type": "dim"}}, "table": "t"}).get_sql()
+    df = q.to_sql(engine_string="sqlite:///" + db + "?timeout=0", retries=5, backoff=0.1)
+    assert list(df["x"]) == [1]
+
+def test_to_sql_no_retries_on_missing_table():
+    engine = "sqlite:///" + os.path.join(os.getcwd(), "grizly", "tests", "chinook.db")
+    q = QFrame().from_dict({"fields": {"x": {"type": "dim"}}, "table": "no_such_table"}).get_sql()
+    start = time.time()
+    with pytest.raises(pandas.errors.DatabaseError):
+        q.to_sql(engine_string=engine, retries=3, backoff=0.5)
+    assert time.time() - start < 0.5
+
+def test_having_orderby_distinct():
+    orders = {
+        "fields": {
+            "Order_Nr": {"type": "dim", "as": "Bookings"},
+            "Customer": {"type": "dim"},
+            "Value": {"type": "num"},
+        },
+        "table": "Orders",
+    }
+    q = QFrame().from_dict(orders)
+    q.groupby(["Order_Nr", "Customer"])["Value"].agg("sum")
+    q.having("sum(Orders.Value) > 100").orderby(["Order_Nr", "Value"], [True, False]).distinct()
+    testsql = """SELECT DISTINCT Orders.Order_Nr AS Bookings,
+                    Orders.Customer,
+                    sum(Orders.Value) AS sum_Value
+                FROM Orders
+                GROUP BY Orders.Order_Nr,
+                        Orders.Customer
+                HAVING sum(Orders.Value) > 100
+                ORDER BY Bookings ASC,
+                        sum_Value DESC
+            """
+    assert clean_testexpr(q.get_sql().sql) == clean_testexpr(testsql)
+
+def test_topn():
+    tracks = {
+        "fields": {
+            "TrackId": {"type": "dim"},
+            "GenreId": {"type": "dim", "as": "Genre"},
+            "Milliseconds": {"type": "num"},
+        },
+        "table": "tracks",
+    }
+    engine = "sqlite:///" + os.path.join(os.getcwd(), "grizly", "tests", "chinook.db")
+    q = QFrame().from_dict(tracks).topn(2, by="Milliseconds", per="GenreId").orderby(["GenreId", "Milliseconds"], False)
+    df = pandas.read_sql(sql=q.get_sql().sql, con=create_engine(engine))
+    all_tracks = pandas.read_sql(sql="SELECT TrackId, GenreId, Milliseconds FROM tracks", con=create_engine(engine))
+    expected = all_tracks.sort_values("Milliseconds", ascending=False).groupby("GenreId").head(2)
+    assert list(df.columns) == ["TrackId", "Genre", "Milliseconds"]
+    assert len(df) == len(expected)
+    assert set(df["TrackId"]) == set(expected["TrackId"])
+    assert df["Genre"].is_monotonic_decreasing
+
+def test_to_sql_batch():
+    engine = "sqlite:///" + os.path.join(os.getcwd(), "grizly", "tests", "chinook.db")
+
+    def get_tracks():
+        tracks = {
+            "fields": {
+                "AlbumId": {"type": "dim"},
+                "MediaTypeId": {"type": "dim"},
+                "Milliseconds": {"type": "num"},
+            },
+            "table": "tracks",
+        }
+        return QFrame().from_dict(deepcopy(tracks)).query("GenreId = 1")
+
+    q1 = get_tracks().groupby(["AlbumId"])["Milliseconds"].agg("sum")
+    q1.data["fields"]["MediaTypeId"]["select"] = 0
+    q2 = get_tracks().groupby(["MediaTypeId"])["Milliseconds"].agg("count")
+    q2.data["fields"]["AlbumId"]["select"] = 0
+    q3 = get_tracks().assign(Seconds="Milliseconds / 1000").orderby("Seconds", False).limit(5)
+    q4 = QFrame().from_dict({"fields": {"Name": {"type": "dim"}}, "table": "genres"})
+    q5 = get_tracks().assign(notable=True, Sec="Bytes / 1000")
+    q6 = get_tracks().groupby(["AlbumId"])["Milliseconds"].agg("sum").having("SUM(Bytes) > 100000000")
+    q6.data["fields"]["MediaTypeId"]["select"] = 0
+    q7 = get_tracks().get_sql()
+    q7.sql += " LIMIT 3"
+    q8 = get_tracks().assign(Price="UnitPrice * 1000")
+    qframes = [q1, q2, q3, q4, q5, q6, q7, q8]
+    dfs = to_sql_batch(qframes, engine_string=engine)
+    assert len(dfs[6]) == 3
+    assert dfs[7]["Price"][0] == "990"
+    for qf, df in zip(qframes, dfs):
+        if qf.sql == "":
+            qf.get_sql()
+        assert df.equals(qf.to_sql(engine_string=engine))
+    assert "source" not in q1.data
+
+def test_to_sql_arrow_and_numpy():
+    tracks = {
+        "fields": {
+            "TrackId": {"type": "dim"},
+            "Name": {"type": "dim"},
+            "Composer": {"type": "dim"},
+            "UnitPrice": {"type": "num"},
+        },
+        "table": "tracks",
+    }
+    engine = "sqlite:///" + os.path.join(os.getcwd(), "grizly", "tests", "chinook.db")
+    q = QFrame().from_dict(tracks).get_sql()
+    df = pandas.read_sql(sql=q.sql, con=create_engine(engine))
+
+    table = q.to_sql(engine_string=engine, format="arrow", chunksize=1000)
+    assert table.num_rows == 3503
+    assert table.column_names == ["TrackId", "Name", "Composer", "UnitPrice"]
+    assert table.to_pandas().equals(df)
+
+    arrays = q.to_sql(engine_string=engine, format="numpy", chunksize=1000)
+    assert arrays["TrackId"].dtype == "int64"
+    assert arrays["UnitPrice"].dtype == "float64"
+    assert arrays["Name"].dtype == object
+    assert list(arrays["Composer"]) == list(df["Composer"].replace({numpy.nan: None}))
+    assert (arrays["UnitPrice"] == df["UnitPrice"].values).all()
+
+def test_compile_catalog(tmp_path):
+    spec_dir = tmp_path / "specs"
+    output_dir = tmp_path / "sql"
+    (spec_dir / "sales").mkdir(parents=True)
+    shutil.copy(os.path.join(os.getcwd(), "grizly", "tests", "tables.xlsx"), str(spec_dir / "tables.xlsx"))
+    orders = {"fields": {"Order": {"type": "dim"}, "Value": {"type": "num"}}, "table": "Orders"}
+    with open(str(spec_dir / "sales" / "orders.json"), "w") as f:
+        json.dump(orders, f)
+    with open(str(spec_dir / "sales" / "broken.json"), "w") as f:
+        json.dump({"fields": {"Order": {"type": "date"}}, "table": "Orders"}, f)
+
+    summary = compile_catalog(str(spec_dir), str(output_dir), workers=2)
+    assert (summary["compiled"], summary["skipped"]) == (3, 0)
+    assert list(summary["errors"]) == [os.path.join("sales", "broken.json")]
+    assert os.path.exists(str(output_dir / "tables__orders.sql"))
+    assert os.path.exists(str(output_dir / "tables__cb_invoices.sql"))
+    with open(str(output_dir / "sales" / "orders.sql")) as f:
+        assert f.read() == QFrame().from_dict(orders).get_sql().sql
+
+    summary = compile_catalog(str(spec_dir), str(output_dir), workers=2)
+    assert (summary["compiled"], summary["skipped"]) == (1, 2)
+    assert list(summary["errors"]) == [os.path.join("sales", "broken.json")]
+
+    orders["fields"]["Part"] = {"type": "dim"}
+    with open(str(spec_dir / "sales" / "orders.json"), "w") as f:
+        json.dump(orders, f)
+    os.remove(str(spec_dir / "sales" / "broken.json"))
+    summary = compile_catalog(str(spec_dir), str(output_dir), workers=2)
+    assert (summary["compiled"], summary["skipped"], summary["removed"]) == (1, 1, 1)
+    with open(str(output_dir / "sales" / "orders.sql")) as f:
+        assert "Orders.Part" in f.read()
+    with open(str(output_dir / "manifest.json")) as f:
+        manifest = json.load(f)
+    assert manifest[os.path.join("sales", "orders.json")]["specs"][os.path.join("sales", "orders.json")]["seconds"] > 0
+
+def get_null_first_db(tmp_path):
+    db = str(tmp_path / "nulls.db")
+    con = sqlite3.connect(db)
+    con.execute("CREATE TABLE t (id INTEGER, grp TEXT, v REAL)")
+    con.executemany(
+        "INSERT INTO t VALUES (?, ?, ?)", [(i, "a" if i % 2 else "b", None if i < 5 else i / 2) for i in range(20)]
+    )
+    con.commit()
+    con.close()
+    q = QFrame().from_dict({"fields": {"id": {"type": "dim"}, "grp": {"type": "dim"}, "v": {"type": "num"}}, "table": "t"})
+    return q.get_sql(), "sqlite:///" + db
+
+def test_explain_without_statistics(tmp_path):
+    q, engine = get_null_first_db(tmp_path)
+    cache = json.dumps(reflect._cache, sort_keys=True)
+    plan = q.explain(engine_string=engine, large_table=10)
+    assert plan["cost"] == 20
+    assert plan["warnings"] == ["Full table scan on t (20 rows)"]
+    assert json.dumps(reflect._cache, sort_keys=True) == cache
+
+def test_to_parquet_null_first_batch(tmp_path):
+    q, engine = get_null_first_db(tmp_path)
+    df = pandas.read_sql(sql=q.sql, con=create_engine(engine))
+    q.to_parquet(str(tmp_path / "t.parquet"), engine_string=engine, chunksize=5)
+    assert pandas.read_parquet(tmp_path / "t.parquet").equals(df)
+    q.to_parquet(str(tmp_path / "t"), engine_string=engine, chunksize=5, partition_by="grp")
+    a = pandas.read_parquet(tmp_path / "t" / "grp=a" / "part-0.parquet")
+    assert a["v"].equals(df[df["grp"] == "a"]["v"].reset_index(drop=True))
+
+def test_to_sql_arrow_null_first_batch(tmp_path):
+    q, engine = get_null_first_db(tmp_path)
+    df = pandas.read_sql(sql=q.sql, con=create_engine(engine))
+    table = q.to_sql(engine_string=engine, format="arrow", chunksize=5)
+    assert str(table.schema.field("v").type) == "double"
+    assert table.to_pandas().equals(df)
+
+def test_to_sql_invalid_options():
+    engine = "sqlite:///" + os.path.join(os.getcwd(), "grizly", "tests", "chinook.db")
+    q = QFrame().from_dict({"fields": {"TrackId": {"type": "dim"}}, "table": "tracks"}).get_sql()
+    with pytest.raises(ValueError):
+        q.to_sql(engine_string=engine, format="arrow", memory_limit=1000)
+    with pytest.raises(ValueError):
+        q.to_sql(engine_string=engine, format="numpy", timeout=10)
+    with pytest.raises(ValueError):
+        q.to_sql(engine_string=engine, memory_limit=1000, retries=3)
+    with pytest.raises(ValueError):
+        q.to_sql(engine_string=engine, spill_dir="/tmp")
+    with pytest.raises(ValueError):
+        q.to_sql(engine_string=engine, format="csv")